@@ -0,0 +1,152 @@
+"""
+JIT-compiled Ramer-Douglas-Peucker polyline simplification.
+
+The kernel operates directly on a raw (N, 2) float64 array and returns a
+boolean keep-mask, so callers slice their own coordinate buffers without any
+geometry-object boxing. Distances are compared squared (no sqrt in the hot
+loop) and the recursion is replaced by an explicit index stack, with a
+max-vertices cap so pathological polygons cannot explode the output.
+
+Requires numba; ``rdp`` is None when it is not installed so callers can fall
+back to their shapely path.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit # JIT compilation of the RDP kernel
+except ImportError:
+    njit = None
+
+
+if njit is not None:
+
+    @njit(cache=True, fastmath=True)
+    def rdp(points, eps_sq, max_vertices):
+        """
+        Simplifies a polyline with the Ramer-Douglas-Peucker algorithm.
+
+        points is an (N, 2) float64 array with N >= 2; eps_sq is the
+        *squared* distance tolerance. Splitting stops once max_vertices
+        points are kept. Returns a boolean mask over the input rows; the
+        first and last point are always kept.
+        """
+        n = points.shape[0]
+        keep = np.zeros(n, dtype=np.bool_)
+        keep[0] = True
+        keep[n - 1] = True
+        kept = 2
+
+        # Explicit (start, end) stack instead of recursion. Each split pops
+        # one range and pushes two, so n entries is always enough.
+        stack = np.empty((n, 2), dtype=np.int64)
+        top = 0
+
+        if n > 3 and points[0, 0] == points[n - 1, 0] \
+                and points[0, 1] == points[n - 1, 1]:
+            # Closed ring: the top-level chord is a point, so running plain
+            # RDP would measure every vertex against the anchor and drop the
+            # whole ring once it is smaller than eps. Force-keep the vertex
+            # farthest from the anchor — regardless of tolerance — and
+            # simplify the two halves of the ring independently.
+            far = -1
+            far_dist = -1.0
+            for i in range(1, n - 1):
+                px = points[i, 0] - points[0, 0]
+                py = points[i, 1] - points[0, 1]
+                d = px * px + py * py
+                if d > far_dist:
+                    far_dist = d
+                    far = i
+            keep[far] = True
+            kept += 1
+            # Also force-keep the farthest-from-chord vertex of each ring
+            # half, so a ring flatter than the tolerance still comes out as
+            # a minimal 4-5 point polygon (what preserve_topology yields in
+            # the shapely path) instead of a zero-area {first, far, last}
+            # sliver. For larger rings RDP would keep these vertices anyway.
+            for half in range(2):
+                if half == 0:
+                    start = 0
+                    end = far
+                else:
+                    start = far
+                    end = n - 1
+                if end - start < 2:
+                    continue
+                x1 = points[start, 0]
+                y1 = points[start, 1]
+                dx = points[end, 0] - x1
+                dy = points[end, 1] - y1
+                den = dx * dx + dy * dy
+                max_num = -1.0
+                index = -1
+                for i in range(start + 1, end):
+                    if den > 0.0:
+                        num = (dy * (points[i, 0] - x1)
+                               - dx * (points[i, 1] - y1)) ** 2
+                    else:
+                        px = points[i, 0] - x1
+                        py = points[i, 1] - y1
+                        num = px * px + py * py
+                    if num > max_num:
+                        max_num = num
+                        index = i
+                keep[index] = True
+                kept += 1
+                stack[top, 0] = start
+                stack[top, 1] = index
+                top += 1
+                stack[top, 0] = index
+                stack[top, 1] = end
+                top += 1
+        else:
+            stack[0, 0] = 0
+            stack[0, 1] = n - 1
+            top = 1
+
+        while top > 0 and kept < max_vertices:
+            top -= 1
+            start = stack[top, 0]
+            end = stack[top, 1]
+            if end - start < 2:
+                continue
+
+            x1 = points[start, 0]
+            y1 = points[start, 1]
+            dx = points[end, 0] - x1
+            dy = points[end, 1] - y1
+            den = dx * dx + dy * dy
+
+            # Find the interior point farthest from the start-end chord,
+            # comparing squared distances scaled by den to avoid the sqrt.
+            max_num = -1.0
+            index = -1
+            for i in range(start + 1, end):
+                if den > 0.0:
+                    num = (dy * (points[i, 0] - x1) - dx * (points[i, 1] - y1)) ** 2
+                else:
+                    # Degenerate chord (closed ring endpoints coincide):
+                    # use the squared distance to the anchor point instead.
+                    px = points[i, 0] - x1
+                    py = points[i, 1] - y1
+                    num = px * px + py * py
+                if num > max_num:
+                    max_num = num
+                    index = i
+
+            threshold = eps_sq * den if den > 0.0 else eps_sq
+            if index >= 0 and max_num > threshold:
+                keep[index] = True
+                kept += 1
+                stack[top, 0] = start
+                stack[top, 1] = index
+                top += 1
+                stack[top, 0] = index
+                stack[top, 1] = end
+                top += 1
+
+        return keep
+
+else:
+    rdp = None
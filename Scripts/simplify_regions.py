@@ -1,8 +1,79 @@
+import argparse
 import os
-import xml.etree.ElementTree as ET
 import json
+import mmap
 import re
-from shapely.geometry import LineString, Polygon # Added for simplification
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+try:
+    from lxml import etree as ET # C-accelerated PAGE XML parsing when available
+    _LXML_AVAILABLE = True
+    _XML_PARSE_ERROR = ET.XMLSyntaxError
+except ImportError:
+    import xml.etree.ElementTree as ET
+    _LXML_AVAILABLE = False
+    _XML_PARSE_ERROR = ET.ParseError
+
+# A single parser instance is reused for every file this script parses.
+_XML_PARSER = ET.XMLParser(remove_blank_text=True, huge_tree=True) if _LXML_AVAILABLE else None
+
+_PAGE_NS_URI = 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'
+_PAGE_NS = {'page': _PAGE_NS_URI}
+
+# Region tags to extract; add other region types as needed.
+REGION_TYPES_TO_PROCESS = ['TextRegion', 'ImageRegion', 'LineDrawingRegion', 'GraphicRegion', 'TableRegion', 'ChartRegion', 'SeparatorRegion', 'MathsRegion', 'NoiseRegion', 'FrameRegion']
+
+# Namespaced forms for lxml's iterparse tag filter, plus a bare-name set for
+# matching events from the stdlib fallback parser.
+_REGION_TAGS = tuple('{%s}%s' % (_PAGE_NS_URI, name) for name in REGION_TYPES_TO_PROCESS)
+_REGION_NAMES = frozenset(REGION_TYPES_TO_PROCESS)
+
+# Compiled once at import; searching/querying per region would re-dispatch
+# these thousands of times per file.
+_TYPE_RE = re.compile(r"structure \{type:([^;}]+)")
+
+# Region types repeat across millions of regions in a large corpus; intern
+# them so each distinct type is one shared string object and comparisons
+# reduce to pointer checks.
+_TYPE_CACHE = {}
+
+
+def _intern_type(value):
+    interned = _TYPE_CACHE.get(value)
+    if interned is None:
+        interned = _TYPE_CACHE.setdefault(value, sys.intern(value))
+    return interned
+
+if _LXML_AVAILABLE:
+    _XP_TEXT_LINE = ET.XPath('.//page:TextLine', namespaces=_PAGE_NS)
+    _XP_TEXT_EQUIV = ET.XPath('.//page:TextEquiv', namespaces=_PAGE_NS)
+    _XP_UNICODE = ET.XPath('page:Unicode', namespaces=_PAGE_NS)
+    _XP_COORDS = ET.XPath('page:Coords', namespaces=_PAGE_NS)
+else:
+    _XP_TEXT_LINE = _XP_TEXT_EQUIV = _XP_UNICODE = _XP_COORDS = None
+import shapely # 2.0 vectorized API (shapely.linestrings / shapely.simplify)
+
+try:
+    import orjson # Fast JSON encoding when available
+except ImportError:
+    orjson = None
+
+try:
+    from rdp_numba import rdp as _rdp # JIT RDP kernel; None without numba
+except ImportError:
+    _rdp = None
+
+# Cap on vertices kept per polygon by the JIT RDP path so noisy traced
+# boundaries cannot explode the output size.
+_RDP_MAX_VERTICES = 64
+
+# Closed polygons at or below this vertex count (rectangles, small quads)
+# are emitted as-is; simplification cannot usefully reduce them.
+_SIMPLIFY_MIN_VERTICES = 8
 
 # --- Configuration ---
 # Adjust this tolerance value to control the level of simplification.
@@ -11,69 +82,144 @@ from shapely.geometry import LineString, Polygon # Added for simplification
 # You'll likely need to experiment with this value based on your specific documents.
 SIMPLIFICATION_TOLERANCE = 200.0 # Example value, adjust as needed
 
+# Default directories, used when no --input-dir/--output-dir is given.
+DEFAULT_INPUT_DIRECTORY = "/Users/gavinl/Desktop/7924/page"
+DEFAULT_OUTPUT_DIRECTORY = "/Volumes/Extreme SSD/Python_Projects/Layout Feature Extraction with LLMs/Data/Simplified Page Regions (JSON)/7924"
+
 def parse_points_string(points_str):
     """
-    Parses a string of space-separated 'x,y' coordinate pairs into a list of [x, y] tuples.
+    Parses a string of space-separated 'x,y' coordinate pairs into an (N, 2)
+    NumPy array in a single C-level tokenizer pass.
     Example input: "10,20 30,40 50,60"
-    Example output: [(10, 20), (30, 40), (50, 60)]
+    Example output: array([[10., 20.], [30., 40.], [50., 60.]])
     """
-    coordinates = []
     if not points_str:
-        return coordinates
-    pairs = points_str.split(' ')
-    for pair in pairs:
-        try:
-            x_str, y_str = pair.split(',')
-            coordinates.append((float(x_str), float(y_str)))
-        except ValueError:
-            # Handle potential errors in coordinate string format, e.g., empty strings if there are double spaces
-            # print(f"Warning: Could not parse point pair '{pair}' in '{points_str}'. Skipping.")
-            continue
-    return coordinates
+        return np.empty((0, 2))
+    coords = np.fromstring(points_str.replace(',', ' '), sep=' ')
+    # Drop a dangling unpaired value from a malformed trailing token.
+    return coords[:(coords.size // 2) * 2].reshape(-1, 2)
 
-def simplify_coordinates(coords_list, tolerance):
+def simplify_coordinates(coords, tolerance):
     """
-    Simplifies a list of [x,y] coordinates using the Ramer-Douglas-Peucker algorithm.
+    Simplifies an (N, 2) coordinate array using the Ramer-Douglas-Peucker algorithm.
     Ensures the polygon is closed before simplification.
+
+    Closure, simplification and rounding all stay in contiguous float64
+    arrays; no intermediate Python lists are built along the way.
     """
-    if not coords_list or len(coords_list) < 3: # Need at least 3 points for a polygon
-        return coords_list
+    if len(coords) < 3: # Need at least 3 points for a polygon
+        return coords.tolist()
 
     # Ensure the polygon is closed (first and last points are the same)
-    # This is important for shapely.geometry.Polygon and for sensible simplification of a closed region
-    closed_coords_list = list(coords_list) # Make a copy
-    if closed_coords_list[0] != closed_coords_list[-1]:
-        closed_coords_list.append(closed_coords_list[0])
-    
-    if len(closed_coords_list) < 3: # Still not enough points after potential closure
-        return closed_coords_list
-
+    arr = np.ascontiguousarray(coords, dtype=np.float64)
+    if not np.array_equal(arr[0], arr[-1]):
+        arr = np.vstack((arr, arr[:1]))
+
+    # Tiny polygons gain nothing from simplification; skip the kernel/GEOS
+    # round trip entirely.
+    if len(arr) <= _SIMPLIFY_MIN_VERTICES:
+        return np.round(arr, 2).tolist()
+
+    if _rdp is not None:
+        keep = _rdp(arr, tolerance * tolerance, _RDP_MAX_VERTICES)
+        simplified = arr[keep]
+        # A closed ring needs at least 4 rows (3 distinct vertices) to
+        # enclose area; anything less means the tolerance swallowed the
+        # region, so keep the unsimplified ring instead.
+        if len(simplified) < 4:
+            return np.round(arr, 2).tolist()
+        return np.round(simplified, 2).tolist() # Round for cleaner JSON
 
     try:
-        # For simplification, we can treat the boundary as a LineString.
-        # If the original shape is a valid Polygon, simplify its exterior.
-        # Using LineString is generally more robust for potentially "messy" input coordinates from tracing.
-        line = LineString(closed_coords_list)
-        simplified_line = line.simplify(tolerance, preserve_topology=True)
-        
-        # Get coordinates from the simplified geometry
-        # The result might be a LineString or MultiLineString (if simplification breaks it)
-        # For simplicity, we'll assume it remains a single LineString representing the polygon boundary
-        if simplified_line.is_empty:
+        # preserve_topology keeps closed rings from collapsing: with plain
+        # Douglas-Peucker, any region smaller than the tolerance degenerates
+        # to its coincident endpoints and vanishes downstream.
+        out = shapely.get_coordinates(
+            shapely.simplify(shapely.linestrings(arr), tolerance, preserve_topology=True))
+        if not len(out):
             return []
-        
-        simplified_coords = list(simplified_line.coords)
 
-        # Ensure the simplified polygon is also explicitly closed in the output list
-        if simplified_coords and simplified_coords[0] != simplified_coords[-1]:
-            simplified_coords.append(simplified_coords[0])
-            
-        return [[round(pt[0], 2), round(pt[1], 2)] for pt in simplified_coords] # Round for cleaner JSON
+        # Ensure the simplified polygon is also explicitly closed in the output
+        if not np.array_equal(out[0], out[-1]):
+            out = np.vstack((out, out[:1]))
+
+        return np.round(out, 2).tolist() # Round for cleaner JSON
 
     except Exception as e:
         print(f"Error during simplification: {e}. Returning original (closed) coordinates.")
         # Return the closed (but not simplified) coordinates in case of an error
-        return [[round(pt[0], 2), round(pt[1], 2)] for pt in closed_coords_list]
+        return np.round(arr, 2).tolist()
+
+
+def simplify_polygons_batch(coords_arrays, tolerance):
+    """
+    Simplifies many polygons at once through shapely 2.0's vectorized array
+    API: all boundaries are packed into a single coordinate buffer, built as
+    LineStrings in one shapely.linestrings call, simplified together, and
+    split back per region with shapely.get_coordinates.
+
+    Returns a list of simplified coordinate lists aligned with coords_arrays.
+    """
+    results = [None] * len(coords_arrays)
+    batch_positions = [] # positions in coords_arrays that go through the batch
+    closed_arrays = []
+    for i, coords in enumerate(coords_arrays):
+        if len(coords) < 3: # Need at least 3 points for a polygon
+            results[i] = coords.tolist()
+            continue
+        # Ensure each polygon is closed before simplification (see simplify_coordinates)
+        if not np.array_equal(coords[0], coords[-1]):
+            coords = np.vstack((coords, coords[:1]))
+        # Tiny polygons gain nothing from simplification; emit them as-is
+        # instead of shipping them through the kernel/GEOS.
+        if len(coords) <= _SIMPLIFY_MIN_VERTICES:
+            results[i] = np.round(coords, 2).tolist()
+            continue
+        batch_positions.append(i)
+        closed_arrays.append(coords)
+
+    if not closed_arrays:
+        return results
+
+    # Prefer the JIT RDP kernel: no geometry-object boxing, squared-distance
+    # comparisons, and a bounded vertex count per polygon.
+    if _rdp is not None:
+        eps_sq = tolerance * tolerance
+        for position, coords in zip(batch_positions, closed_arrays):
+            coords = np.ascontiguousarray(coords, dtype=np.float64)
+            keep = _rdp(coords, eps_sq, _RDP_MAX_VERTICES)
+            simplified = coords[keep]
+            # Degenerate result (see simplify_coordinates): keep the ring.
+            if len(simplified) < 4:
+                simplified = coords
+            results[position] = np.round(simplified, 2).tolist() # Round for cleaner JSON
+        return results
+
+    try:
+        flat_coords = np.concatenate(closed_arrays)
+        counts = np.fromiter((len(c) for c in closed_arrays), dtype=np.intp,
+                             count=len(closed_arrays))
+        geom_indices = np.repeat(np.arange(len(closed_arrays)), counts)
+
+        lines = shapely.linestrings(flat_coords, indices=geom_indices)
+        # preserve_topology keeps closed rings from collapsing (see
+        # simplify_coordinates); the batch stays vectorized either way.
+        simplified = shapely.simplify(lines, tolerance, preserve_topology=True)
+        out_coords, out_indices = shapely.get_coordinates(simplified, return_index=True)
+
+        # Split the flat result buffer back into one segment per geometry.
+        split_points = np.searchsorted(out_indices, np.arange(1, len(closed_arrays)))
+        for position, segment in zip(batch_positions, np.split(out_coords, split_points)):
+            # Ensure the simplified polygon is also explicitly closed in the output
+            if len(segment) and not np.array_equal(segment[0], segment[-1]):
+                segment = np.vstack((segment, segment[:1]))
+            results[position] = np.round(segment, 2).tolist() # Round for cleaner JSON
+    except Exception as e:
+        print(f"Error during batched simplification: {e}. Falling back to per-region simplification.")
+        for position, coords in zip(batch_positions, closed_arrays):
+            results[position] = simplify_coordinates(coords, tolerance)
+
+    return results
 
 
 def extract_data_from_xml(xml_file_path):
@@ -81,6 +227,9 @@ def extract_data_from_xml(xml_file_path):
     Parses a PAGE XML file, extracts text regions with their type, text,
     and simplified polygon coordinates.
 
+    The file is streamed with iterparse so only one region subtree is held
+    in memory at a time instead of materializing the whole document tree.
+
     Args:
         xml_file_path (str): The path to the input XML file.
 
@@ -90,114 +239,148 @@ def extract_data_from_xml(xml_file_path):
               Returns an empty list if no processable regions are found.
     """
     json_output = []
-    
+
+    # Coordinates are collected here and simplified in one batched call after
+    # the region loop, keyed by position in json_output.
+    pending_polygons = [] # (index into json_output, (N, 2) coords array)
+
     try:
-        tree = ET.parse(xml_file_path)
-        root = tree.getroot()
-    except ET.ParseError:
+        # Memory-map the file and let the parser scan the mapped region
+        # directly instead of pulling it through small chunked reads; the
+        # map must stay open while the lazy iterparse runs.
+        with open(xml_file_path, 'rb') as xml_file, \
+                mmap.mmap(xml_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if _LXML_AVAILABLE:
+                # The tag filter makes libxml2 skip events for everything but
+                # fully built region subtrees.
+                context = ET.iterparse(mapped, events=('end',), tag=_REGION_TAGS)
+            else:
+                context = ET.iterparse(mapped, events=('end',))
+
+            for _, region_element in context:
+                ns_prefix, _, region_tag_name = region_element.tag.rpartition('}')
+                if region_tag_name not in _REGION_NAMES:
+                    continue
+                # The namespace URI might vary slightly in different versions of
+                # PAGE XML; fall back to plain findall when it does.
+                ns_uri = ns_prefix[1:] if ns_prefix.startswith('{') else ''
+                ns = {'page': ns_uri} if ns_uri else {}
+                use_xpath = _XP_TEXT_LINE is not None and ns_uri == _PAGE_NS_URI
+
+                region_data = {}
+
+                # Get region type from 'custom' attribute (as in original script) or tag name
+                custom_attr = region_element.get('custom', '')
+                match = _TYPE_RE.search(custom_attr)
+                if match:
+                    region_data['type'] = _intern_type(match.group(1))
+                else:
+                    region_data['type'] = _intern_type(region_tag_name) # Default to the tag name if no custom type
+
+                # Extract text content (as in original script)
+                region_text_parts = []
+                if use_xpath:
+                    text_lines = _XP_TEXT_LINE(region_element)
+                else:
+                    text_lines = region_element.findall('.//page:TextLine', ns) if ns else region_element.findall('.//TextLine')
+                for text_line in text_lines:
+                    if use_xpath:
+                        text_equivs = _XP_TEXT_EQUIV(text_line)
+                    else:
+                        text_equivs = text_line.findall('.//page:TextEquiv', ns) if ns else text_line.findall('.//TextEquiv')
+                    for text_equiv in text_equivs:
+                        if use_xpath:
+                            unicode_elements = _XP_UNICODE(text_equiv)
+                            unicode_text_element = unicode_elements[0] if unicode_elements else None
+                        else:
+                            unicode_text_element = text_equiv.find('page:Unicode', ns) if ns else text_equiv.find('Unicode')
+                        if unicode_text_element is not None and unicode_text_element.text:
+                            region_text_parts.append(unicode_text_element.text.strip())
+                region_data['text'] = " ".join(region_text_parts).strip()
+
+                # Extract and simplify coordinates
+                if use_xpath:
+                    coords_elements = _XP_COORDS(region_element)
+                    coords_element = coords_elements[0] if coords_elements else None
+                else:
+                    coords_element = region_element.find('page:Coords', ns) if ns else region_element.find('Coords')
+                region_data['simplified_polygon'] = [] # Filled in by the batched simplification below
+
+                # Only add region if it has a type (and optionally text or polygon)
+                if region_data.get('type'):
+                    if coords_element is not None and coords_element.get('points'):
+                        original_coords = parse_points_string(coords_element.get('points'))
+                        if len(original_coords):
+                            pending_polygons.append((len(json_output), original_coords))
+                    json_output.append(region_data)
+
+                # Release the processed subtree (and, with lxml, already-seen
+                # siblings) so memory stays bounded by one region.
+                region_element.clear()
+                if _LXML_AVAILABLE:
+                    while region_element.getprevious() is not None:
+                        del region_element.getparent()[0]
+    except (_XML_PARSE_ERROR, ValueError): # ValueError: empty file cannot be mapped
         print(f"Error parsing XML file: {xml_file_path}. Skipping.")
         return []
 
-    # Define the namespace (assuming PAGE XML as per your samples)
-    # The namespace URI might vary slightly in different versions of PAGE XML.
-    # Check your XML files if you encounter issues.
-    ns_uri = root.tag.split('}')[0][1:] if '}' in root.tag else ''
-    ns = {'page': ns_uri} if ns_uri else {}
-    
-    # Find the Page element
-    page_element_name = 'Page'
-    if ns:
-        page_element_name = f"{{{ns['page']}}}{page_element_name}"
-    else: # If no namespace is detected at root, try finding Page without it (less common for PAGE XML)
-        page_element_name = 'Page'
-
-    page_element = root.find(page_element_name, ns)
-
-    if page_element is None:
-         # If root is PcGts, Page might be a direct child without prefix if ns wasn't properly caught or used by find
-        if root.tag.endswith("PcGts"): # Common root tag for PAGE XML
-            page_element = root.find('page:Page', {'page': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'}) # Try with common PAGE ns
-            if page_element is None:
-                 page_element = root.find('Page') # Try without explicit namespace mapping in find
-
-        if page_element is None:
-            print(f"Could not find Page element in {xml_file_path}. Skipping.")
-            return []
+    # Simplify all collected polygons in one vectorized shapely call.
+    if pending_polygons:
+        simplified_batch = simplify_polygons_batch(
+            [coords for _, coords in pending_polygons], SIMPLIFICATION_TOLERANCE)
+        for (output_index, _), simplified_coords in zip(pending_polygons, simplified_batch):
+            json_output[output_index]['simplified_polygon'] = simplified_coords
 
+    return json_output
 
-    # Iterate through different types of regions if necessary.
-    # For now, focusing on TextRegion as per original script and typical PAGE XML.
-    region_types_to_process = ['TextRegion', 'ImageRegion', 'LineDrawingRegion', 'GraphicRegion', 'TableRegion', 'ChartRegion', 'SeparatorRegion', 'MathsRegion', 'NoiseRegion', 'FrameRegion'] # Add other region types as needed
-
-    for region_tag_name in region_types_to_process:
-        
-        find_query = f'page:{region_tag_name}' if ns else region_tag_name
-        
-        for region_element in page_element.findall(find_query, ns):
-            region_data = {}
-            
-            # Get region type from 'custom' attribute (as in original script) or tag name
-            custom_attr = region_element.get('custom', '')
-            match = re.search(r"structure {type:([^;}]+);?", custom_attr)
-            if match:
-                region_data['type'] = match.group(1)
-            else:
-                region_data['type'] = region_tag_name # Default to the tag name if no custom type
-
-            # Extract text content (as in original script)
-            region_text_parts = []
-            for text_line in region_element.findall('.//page:TextLine', ns) if ns else region_element.findall('.//TextLine'):
-                for text_equiv in text_line.findall('.//page:TextEquiv', ns) if ns else text_line.findall('.//TextEquiv'):
-                    unicode_text_element = text_equiv.find('page:Unicode', ns) if ns else text_equiv.find('Unicode')
-                    if unicode_text_element is not None and unicode_text_element.text:
-                        region_text_parts.append(unicode_text_element.text.strip())
-            region_data['text'] = " ".join(region_text_parts).strip()
-
-            # Extract and simplify coordinates
-            coords_element = region_element.find('page:Coords', ns) if ns else region_element.find('Coords')
-            if coords_element is not None and coords_element.get('points'):
-                points_str = coords_element.get('points')
-                original_coords = parse_points_string(points_str)
-                if original_coords:
-                    simplified_poly_coords = simplify_coordinates(original_coords, SIMPLIFICATION_TOLERANCE)
-                    region_data['simplified_polygon'] = simplified_poly_coords
-                else:
-                    region_data['simplified_polygon'] = [] # No valid points found
-            else:
-                region_data['simplified_polygon'] = [] # No Coords element or points attribute
+def process_one_file(xml_file_path, output_dir):
+    """
+    Extracts and simplifies regions from a single XML file and writes the
+    result as JSON into output_dir.
 
-            # Only add region if it has a type (and optionally text or polygon)
-            if region_data.get('type'):
-                 json_output.append(region_data)
-                 
-    return json_output
+    Runs inside a worker process; returns the output path on success, or
+    None if nothing was extracted or the write failed.
+    """
+    filename = os.path.basename(xml_file_path)
+    print(f"Processing file: {filename}...")
 
-def main():
+    extracted_data = extract_data_from_xml(xml_file_path)
+
+    if not extracted_data:
+        print(f"No data extracted or to save for {filename}.")
+        return None
+
+    base_filename = os.path.splitext(filename)[0]
+    # --- FIX: Added .json extension to the output filename ---
+    json_file_path = os.path.join(output_dir, f"{base_filename}.json")
+
+    try:
+        if orjson is not None:
+            # orjson serializes at C speed and writes bytes directly; the
+            # indent is 2 spaces instead of stdlib's 4.
+            with open(json_file_path, 'wb') as json_file:
+                json_file.write(orjson.dumps(extracted_data, option=orjson.OPT_INDENT_2))
+        else:
+            with open(json_file_path, 'w', encoding='utf-8') as json_file:
+                json.dump(extracted_data, json_file, indent=4, ensure_ascii=False)
+    except IOError as e:
+        print(f"Error writing JSON file {json_file_path}: {e}")
+        return None
+    return json_file_path
+
+
+def process_directory(input_directory, output_directory):
     """
-    Main function to process all XML files in the input directory and
-    save the extracted data as JSON files in the output directory.
+    Processes all XML files in one input directory and saves the extracted
+    data as JSON files in the output directory.
     """
-    # --- Directories ---
-    # Make sure these directories exist or are created before running.
-    current_script_dir = os.path.dirname(os.path.abspath(__file__))
-    # Ensure INPUT_DIRECTORY and OUTPUT_DIRECTORY are correctly joined if they are not absolute paths
-    # If the paths provided by the user are absolute, os.path.join will handle them correctly.
-    # If they are relative, they will be relative to current_script_dir.
-    INPUT_DIRECTORY = "/Users/gavinl/Desktop/7924/page" 
-    OUTPUT_DIRECTORY = "/Volumes/Extreme SSD/Python_Projects/Layout Feature Extraction with LLMs/Data/Simplified Page Regions (JSON)/7924"
-
-    # If the provided paths are intended to be relative to the script, use this:
-    # INPUT_DIRECTORY = os.path.join(current_script_dir, "Users/gavinl/Desktop/7924/page") 
-    # OUTPUT_DIRECTORY = os.path.join(current_script_dir, "Volumes/Extreme SSD/Python_Projects/Layout Feature Extraction with LLMs/Data/Simplified Page Regions (JSON)/7924")
-
-
-    if not os.path.exists(INPUT_DIRECTORY):
-        print(f"Input directory '{INPUT_DIRECTORY}' does not exist. Please create it and add XML files.")
+    if not os.path.exists(input_directory):
+        print(f"Input directory '{input_directory}' does not exist. Please create it and add XML files.")
         # For demonstration, let's create dummy input if it doesn't exist.
         # You should place your actual XML files here.
-        os.makedirs(INPUT_DIRECTORY, exist_ok=True)
+        os.makedirs(input_directory, exist_ok=True)
         # Create a dummy XML file for testing if the directory was just created and is empty
-        if not os.listdir(INPUT_DIRECTORY):
+        if not os.listdir(input_directory):
             dummy_xml_filename = "dummy_example_page.xml"
             dummy_xml_content = """<?xml version='1.0' encoding='UTF-8'?>
 <PcGts xmlns="http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15 http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15/pagecontent.xsd">
@@ -230,52 +413,81 @@ def main():
     </ImageRegion>
   </Page>
 </PcGts>"""
-            with open(os.path.join(INPUT_DIRECTORY, dummy_xml_filename), "w", encoding="utf-8") as df:
+            with open(os.path.join(input_directory, dummy_xml_filename), "w", encoding="utf-8") as df:
                 df.write(dummy_xml_content)
-            print(f"Created a dummy XML file for testing: {os.path.join(INPUT_DIRECTORY, dummy_xml_filename)}")
+            print(f"Created a dummy XML file for testing: {os.path.join(input_directory, dummy_xml_filename)}")
 
 
-    if not os.path.exists(OUTPUT_DIRECTORY):
-        os.makedirs(OUTPUT_DIRECTORY)
-        print(f"Created output directory: {OUTPUT_DIRECTORY}")
+    if not os.path.exists(output_directory):
+        os.makedirs(output_directory)
+        print(f"Created output directory: {output_directory}")
 
-    print(f"Processing XML files from: {INPUT_DIRECTORY}")
-    print(f"Saving JSON files to: {OUTPUT_DIRECTORY}")
+    print(f"Processing XML files from: {input_directory}")
+    print(f"Saving JSON files to: {output_directory}")
     print(f"Simplification Tolerance set to: {SIMPLIFICATION_TOLERANCE}")
     print("-" * 30)
 
+    # scandir hands back cached DirEntry objects, avoiding a stat per file
+    # on large (often network/external) input directories.
+    with os.scandir(input_directory) as entries:
+        xml_file_paths = [entry.path for entry in entries
+                          if entry.name.endswith(".xml") and entry.is_file()]
+
+    # Every file is independent (XML parse + simplify + JSON write), so fan
+    # the loop out across processes; chunksize keeps dispatch overhead low
+    # when there are thousands of small files.
     processed_files = 0
-    for filename in os.listdir(INPUT_DIRECTORY):
-        if filename.endswith(".xml"):
-            xml_file_path = os.path.join(INPUT_DIRECTORY, filename)
-            print(f"Processing file: {filename}...")
-            
-            extracted_data = extract_data_from_xml(xml_file_path)
-            
-            if extracted_data:
-                base_filename = os.path.splitext(filename)[0]
-                # --- FIX: Added .json extension to the output filename ---
-                json_file_path = os.path.join(OUTPUT_DIRECTORY, f"{base_filename}.json") 
-                
-                try:
-                    with open(json_file_path, 'w', encoding='utf-8') as json_file:
-                        json.dump(extracted_data, json_file, indent=4, ensure_ascii=False)
-                    print(f"Successfully saved simplified data to: {json_file_path}")
-                    processed_files +=1
-                except IOError as e:
-                    print(f"Error writing JSON file {json_file_path}: {e}")
-            else:
-                print(f"No data extracted or to save for {filename}.")
-            print("-" * 30)
+    worker = partial(process_one_file, output_dir=output_directory)
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for json_file_path in executor.map(worker, xml_file_paths, chunksize=8):
+            if json_file_path:
+                print(f"Successfully saved simplified data to: {json_file_path}")
+                processed_files += 1
 
     print(f"Processing complete. Processed {processed_files} XML file(s).")
 
+
+def _warm_up_simplifier():
+    """
+    Triggers the Numba compile/cache load for the RDP kernel once up front,
+    before the worker processes are forked, so no worker pays it again.
+    """
+    if _rdp is not None:
+        _rdp(np.zeros((4, 2)), 1.0, _RDP_MAX_VERTICES)
+
+
+def main():
+    """
+    Parses the command line and processes each input directory in turn.
+
+    Accepting several --input-dir values lets one long-lived process handle
+    a whole batch of folders, paying interpreter startup and JIT warm-up
+    only once.
+    """
+    parser = argparse.ArgumentParser(
+        description="Extract and simplify PAGE XML region polygons into JSON files.")
+    parser.add_argument('--input-dir', dest='input_dirs', action='append', metavar='DIR',
+                        help="Directory of PAGE XML files; repeat for multiple directories. "
+                             "Defaults to the hard-coded input directory.")
+    parser.add_argument('--output-dir', dest='output_dir', metavar='DIR',
+                        default=DEFAULT_OUTPUT_DIRECTORY,
+                        help="Directory the JSON files are written to.")
+    args = parser.parse_args()
+
+    input_dirs = args.input_dirs or [DEFAULT_INPUT_DIRECTORY]
+
+    _warm_up_simplifier()
+
+    for input_directory in input_dirs:
+        process_directory(input_directory, args.output_dir)
+
+
 if __name__ == "__main__":
     # Before running:
     # 1. Make sure you have the 'shapely' library installed.
     #    If not, run: pip install shapely
     # 2. Create a folder named "input_xml_files" in the same directory as this script 
-    #    OR update INPUT_DIRECTORY to your actual path.
+    #    OR update input_directory to your actual path.
     # 3. Place your XML files (e.g., NL-HaNA_1.04.02_7923_0171.xml) into the input folder.
-    # 4. An output folder (as specified in OUTPUT_DIRECTORY) will be created by the script if it doesn't exist.
+    # 4. An output folder (as specified in output_directory) will be created by the script if it doesn't exist.
     main()
\ No newline at end of file
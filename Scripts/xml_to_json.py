@@ -1,7 +1,68 @@
 import os
-import xml.etree.ElementTree as ET
 import json
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+try:
+    from lxml import etree as ET # C-accelerated PAGE XML parsing when available
+    _LXML_AVAILABLE = True
+    _XML_PARSE_ERROR = ET.XMLSyntaxError
+except ImportError:
+    import xml.etree.ElementTree as ET
+    _LXML_AVAILABLE = False
+    _XML_PARSE_ERROR = ET.ParseError
+
+# A single parser instance is reused for every file this script parses.
+_XML_PARSER = ET.XMLParser(remove_blank_text=True, huge_tree=True) if _LXML_AVAILABLE else None
+
+# Define the namespace
+NS = {'page': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'}
+
+# Compiled once at import; per-region re.search would re-dispatch the
+# pattern on every call.
+_TYPE_RE = re.compile(r'type:\s*([^;}]+)')
+
+# Region types repeat across millions of regions in a large corpus; intern
+# them so each distinct type is one shared string object and comparisons
+# reduce to pointer checks.
+_TYPE_CACHE = {}
+
+
+def _intern_type(value):
+    interned = _TYPE_CACHE.get(value)
+    if interned is None:
+        interned = _TYPE_CACHE.setdefault(value, sys.intern(value))
+    return interned
+
+if _LXML_AVAILABLE:
+    _XP_PAGE = ET.XPath('page:Page', namespaces=NS)
+    _XP_TEXT_REGION = ET.XPath('page:TextRegion', namespaces=NS)
+    _XP_TEXT_LINE = ET.XPath('page:TextLine', namespaces=NS)
+    _XP_WORD = ET.XPath('page:Word', namespaces=NS)
+    _XP_UNICODE = ET.XPath('page:TextEquiv/page:Unicode', namespaces=NS)
+    # All word-level text leaves of a line in one C traversal, instead of
+    # a Python-level find per word.
+    _XP_WORD_UNICODE = ET.XPath('./page:Word/page:TextEquiv/page:Unicode', namespaces=NS)
+else:
+    _XP_PAGE = _XP_TEXT_REGION = _XP_TEXT_LINE = _XP_WORD = _XP_UNICODE = None
+    _XP_WORD_UNICODE = None
+
+
+def _find_all(xpath, element, path):
+    """findall, routed through a precompiled XPath object when lxml is available."""
+    if xpath is not None:
+        return xpath(element)
+    return element.findall(path, NS)
+
+
+def _find_first(xpath, element, path):
+    """find, routed through a precompiled XPath object when lxml is available."""
+    if xpath is not None:
+        found = xpath(element)
+        return found[0] if found else None
+    return element.find(path, NS)
 
 def extract_text_from_xml(xml_file_path):
     """
@@ -19,54 +80,56 @@ def extract_text_from_xml(xml_file_path):
     json_output = []
     
     try:
-        tree = ET.parse(xml_file_path)
+        tree = ET.parse(xml_file_path, _XML_PARSER)
         root = tree.getroot()
-    except ET.ParseError:
+    except _XML_PARSE_ERROR:
         print(f"Error parsing XML file: {xml_file_path}. Skipping.")
         return []
 
-    # Define the namespace
-    ns = {'page': 'http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15'}
-
-    page_element = root.find('page:Page', ns)
+    page_element = _find_first(_XP_PAGE, root, 'page:Page')
     if page_element is None:
         # Handle cases where Page element might be missing or named differently (though unlikely for PAGE XML)
         # Or if the XML is empty like NL-HaNA_1.04.02_7923_0006.xml
         return []
 
-    for text_region in page_element.findall('page:TextRegion', ns):
+    for text_region in _find_all(_XP_TEXT_REGION, page_element, 'page:TextRegion'):
         custom_attr = text_region.get('custom', '')
-        
+
         # Extract region type using regex to find "type:actual_type;"
-        match = re.search(r'type:\s*([^;}]+)', custom_attr)
+        match = _TYPE_RE.search(custom_attr)
         if not match:
-            continue 
-        region_type = match.group(1).strip()
+            continue
+        region_type = _intern_type(match.group(1).strip())
 
         region_texts = []
-        text_lines = text_region.findall('page:TextLine', ns)
+        text_lines = _find_all(_XP_TEXT_LINE, text_region, 'page:TextLine')
 
         if not text_lines: # Check for text directly under TextRegion if no TextLines
-            text_equiv_direct = text_region.find('page:TextEquiv/page:Unicode', ns)
+            text_equiv_direct = _find_first(_XP_UNICODE, text_region, 'page:TextEquiv/page:Unicode')
             if text_equiv_direct is not None and text_equiv_direct.text:
                 region_texts.append(text_equiv_direct.text.strip())
         else:
             for text_line in text_lines:
                 # Prioritize full TextEquiv for the line
-                line_text_equiv = text_line.find('page:TextEquiv/page:Unicode', ns)
+                line_text_equiv = _find_first(_XP_UNICODE, text_line, 'page:TextEquiv/page:Unicode')
                 if line_text_equiv is not None and line_text_equiv.text:
                     line_text = line_text_equiv.text.strip()
                     if line_text: # Ensure non-empty text
                         region_texts.append(line_text)
                 else:
                     # Fallback to concatenating words if no full line TextEquiv
-                    word_texts = []
-                    for word in text_line.findall('page:Word', ns):
-                        word_text_equiv = word.find('page:TextEquiv/page:Unicode', ns)
-                        if word_text_equiv is not None and word_text_equiv.text:
-                            word_text = word_text_equiv.text.strip()
-                            if word_text: # Ensure non-empty word text
-                                word_texts.append(word_text)
+                    if _XP_WORD_UNICODE is not None:
+                        word_texts = [unicode_el.text.strip()
+                                      for unicode_el in _XP_WORD_UNICODE(text_line)
+                                      if unicode_el.text and unicode_el.text.strip()]
+                    else:
+                        word_texts = []
+                        for word in _find_all(_XP_WORD, text_line, 'page:Word'):
+                            word_text_equiv = _find_first(_XP_UNICODE, word, 'page:TextEquiv/page:Unicode')
+                            if word_text_equiv is not None and word_text_equiv.text:
+                                word_text = word_text_equiv.text.strip()
+                                if word_text: # Ensure non-empty word text
+                                    word_texts.append(word_text)
                     if word_texts:
                         region_texts.append(" ".join(word_texts))
         
@@ -79,6 +142,24 @@ def extract_text_from_xml(xml_file_path):
             
     return json_output
 
+def process_one_file(xml_file_path, output_dir):
+    """
+    Converts a single XML file to JSON inside a worker process.
+
+    Returns the output path so the parent can report progress.
+    """
+    print(f"Processing {xml_file_path}...")
+
+    json_data = extract_text_from_xml(xml_file_path)
+
+    base_filename = os.path.splitext(os.path.basename(xml_file_path))[0]
+    json_file_path = os.path.join(output_dir, f"{base_filename}.json")
+
+    with open(json_file_path, 'w', encoding='utf-8') as f:
+        json.dump(json_data, f, ensure_ascii=False, indent=4)
+    return json_file_path
+
+
 def convert_xml_directory_to_json(input_dir, output_dir):
     """
     Converts all XML files in an input directory to JSON format and
@@ -92,18 +173,17 @@ def convert_xml_directory_to_json(input_dir, output_dir):
         os.makedirs(output_dir)
         print(f"Created output directory: {output_dir}")
 
-    for filename in os.listdir(input_dir):
-        if filename.endswith(".xml"):
-            xml_file_path = os.path.join(input_dir, filename)
-            print(f"Processing {xml_file_path}...")
-            
-            json_data = extract_text_from_xml(xml_file_path)
-            
-            base_filename = os.path.splitext(filename)[0]
-            json_file_path = os.path.join(output_dir, f"{base_filename}.json")
-            
-            with open(json_file_path, 'w', encoding='utf-8') as f:
-                json.dump(json_data, f, ensure_ascii=False, indent=4)
+    # scandir hands back cached DirEntry objects, avoiding a stat per file
+    # on large (often network/external) input directories.
+    with os.scandir(input_dir) as entries:
+        xml_file_paths = [entry.path for entry in entries
+                          if entry.name.endswith(".xml") and entry.is_file()]
+
+    # Every file is independent, so fan the loop out across processes;
+    # chunksize keeps dispatch overhead low for thousands of small files.
+    worker = partial(process_one_file, output_dir=output_dir)
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for json_file_path in executor.map(worker, xml_file_paths, chunksize=8):
             print(f"Successfully converted to {json_file_path}")
 
 if __name__ == '__main__':